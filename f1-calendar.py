@@ -1,7 +1,14 @@
 import unittest
 import math
 import csv
+import json
 import random
+import sys
+import itertools
+import os
+import tempfile
+from multiprocessing import Pool
+from time import perf_counter
 from simanneal import Annealer
 from deap import base, creator, tools
 from math import *
@@ -157,6 +164,87 @@ class UnitTests (unittest.TestCase):
         self.assertEqual(checkSummerShutdown(weekends1), True)
         self.assertEqual(checkSummerShutdown(weekends2), False)
 
+    # will test that the scenario grid file is expanded into every combination of its values
+    def testReadScenarioGrid(self):
+        scenarios = readScenarioGrid('scenarios.csv')
+
+        # 2 homes x 2 cooling rates x 3 seeds x 2 constraints
+        self.assertEqual(len(scenarios), 24)
+        self.assertEqual(scenarios[0], {'home': 9, 'cooling_rate': 0.99, 'start_temperature': 10000.0,
+                                        'stop_temperature': 10.0, 'seed': 1, 'constraint': 'none'})
+        self.assertEqual(scenarios[-1], {'home': 13, 'cooling_rate': 0.95, 'start_temperature': 10000.0,
+                                         'stop_temperature': 10.0, 'seed': 3, 'constraint': 'temperature'})
+
+    # will test that a scenario run is repeatable for the same seed and visits every track once
+    def testRunScenario(self):
+        initBatchWorker(readTrackLocations(), readRaceWeekends(), readSundays())
+        scenario = {'home': 9, 'cooling_rate': 0.95, 'start_temperature': 10000.0, 'stop_temperature': 10.0,
+                    'seed': 1, 'constraint': 'none'}
+
+        result1 = runScenario(scenario)
+        result2 = runScenario(scenario)
+        self.assertEqual(result1['itinerary'], result2['itinerary'])
+        self.assertAlmostEqual(result1['distance'], result2['distance'], delta=0.0001)
+        self.assertEqual(len(set(result1['itinerary'])), 22)
+        self.assertTrue(result1['feasible'])
+
+    # will test that the temperature violations are counted per race. the default calendar only breaks it for azerbaijan
+    def testCountTemperatureViolations(self):
+        tracks = readTrackLocations()
+        sundays = readSundays()
+        weekends1 = [9, 11, 13, 17, 18, 21, 22, 24, 26, 27, 29, 30, 34, 35, 37, 38, 40, 42, 43, 44, 46, 47]
+        weekends2 = [9, 11, 43, 30, 37, 21, 40, 34, 22, 35, 29, 26, 27, 24, 44, 42, 46, 18, 38, 13, 17, 47]
+
+        self.assertEqual(countTemperatureViolations(tracks, weekends1, sundays), 1)
+        self.assertEqual(countTemperatureViolations(tracks, weekends2, sundays), 0)
+
+    # will test that the annealing can take the default calendar, which breaks the temperature constraint, to a feasible one
+    def testRunScenarioTemperature(self):
+        initBatchWorker(readTrackLocations(), readRaceWeekends(), readSundays())
+        scenario = {'home': 13, 'cooling_rate': 0.99, 'start_temperature': 10000.0, 'stop_temperature': 10.0,
+                    'seed': 1, 'constraint': 'temperature'}
+
+        result = runScenario(scenario)
+        self.assertEqual(result['violations'], 0)
+        self.assertTrue(result['feasible'])
+
+    # will test that bad values in the scenario grid are rejected before anything is run
+    def testScenarioGridValidation(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for contents in ['seed,\n', 'cooling_rate,1.5\n', 'constraint,four-in-row\n', 'weather,sunny\n',
+                             'stop_temperature,-1\n', 'start_temperature,5\nstop_temperature,10\n',
+                             'seed,1,2\nseed,3\n']:
+                grid_file = os.path.join(directory, 'grid.csv')
+                with open(grid_file, 'w') as file:
+                    file.write(contents)
+                with self.assertRaises(ValueError):
+                    readScenarioGrid(grid_file)
+
+            with open(grid_file, 'w') as file:
+                file.write('home,9,22\n')
+            with self.assertRaises(ValueError):
+                runBatch(grid_file, os.path.join(directory, 'results.jsonl'), processes=1)
+            self.assertFalse(os.path.exists(os.path.join(directory, 'results.jsonl')))
+
+    # will test that the batch writes one JSON line per scenario in the order of the grid
+    def testRunBatch(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output_file = os.path.join(directory, 'results.jsonl')
+            self.assertEqual(runBatch('scenarios.csv', output_file, processes=1), 24)
+
+            with open(output_file) as file:
+                results = [json.loads(line) for line in file]
+
+        self.assertEqual(len(results), 24)
+        for scenario, result in zip(readScenarioGrid('scenarios.csv'), results):
+            for name, value in scenario.items():
+                self.assertEqual(result[name], value)
+            self.assertEqual(len(result['itinerary']), 22)
+            self.assertGreater(result['distance'], 0)
+            self.assertGreaterEqual(result['time_ms'], 0)
+            self.assertIn('feasible', result)
+            self.assertIn('violations', result)
+
 # function that will calculate the total distance for the season assuming a given racetrack as the home racetrack
 # the following will be assumed:
 # - on a weekend where there is no race the team will return home
@@ -208,8 +296,15 @@ def checkFourRaceInRow(weekends):
 # function that will check to see if the temperature constraint for all races is satisfied. The temperature
 # constraint is that a minimum temperature of 20 degrees for the month is required for a race to run
 def checkTemperatureConstraint(tracks, weekends, sundays):
+    return countTemperatureViolations(tracks, weekends, sundays) == 0
+
+
+# function that will count how many races break the temperature constraint. this lets the simulated annealing see how
+# close a calendar is to satisfying the constraint rather than just whether it does
+def countTemperatureViolations(tracks, weekends, sundays):
     temperature_min = 20
     temperature_max = 35
+    violations = 0
 
     for i in range(len(weekends)):
         current_weekend = weekends[i]
@@ -221,11 +316,9 @@ def checkTemperatureConstraint(tracks, weekends, sundays):
         current_temperature = current_track[current_month + 3]  # Assuming temperature starts at index 3
 
         if current_temperature < temperature_min or current_temperature > temperature_max:
-            #print(f"Temperature constraint not satisfied for weekend {current_weekend} at track {current_track[0]}")
-            #print(f"Temperature: {current_temperature} degrees")
-            return False
+            violations += 1
 
-    return True
+    return violations
 
 
 # function that will check to see if there is a four week gap anywhere in july and august. we will need this for the summer shutdown.
@@ -418,19 +511,22 @@ def readTrackLocations():
 
 # function that will run the simulated annealing case for shortening the distance seperately for both silverstone and monza. it will also do a free calendar experiement
 # to see if it can be cut down further
-def simulated_annealing(initial_state, energy_function, temperature_constraint=None, **kwargs):
+def simulated_annealing(initial_state, energy_function, temperature_constraint=None, cooling_rate=0.99,
+                        initial_temperature=1.0, final_temperature=0.1, **kwargs):
     current_state = initial_state
     current_energy = energy_function(current_state, **kwargs)
     best_state = current_state
     best_energy = current_energy
 
-    temperature = 1.0
-    cooling_rate = 0.99
+    # the temperatures need to be on the same scale as the energy for worse moves to ever be accepted
+    temperature = initial_temperature
 
-    while temperature > 0.1:
+    while temperature > final_temperature:
         new_state = current_state[:]  # Make a copy of the current state
-        # Perform a move to generate a new state, e.g., swap races
-        # Implement your move logic here
+        # Perform a move to generate a new state by swapping two random races
+        if len(new_state) > 1:
+            i, j = random.sample(range(len(new_state)), 2)
+            new_state[i], new_state[j] = new_state[j], new_state[i]
 
         new_energy = energy_function(new_state, **kwargs)
 
@@ -491,6 +587,131 @@ def SACases():
     printItinerary(tracks, final_state)
     print(f"Total Distance: {final_energy} km")
 
+
+# the constraint variants a scenario can be run under. each one takes the tracks in race order, the weekends, and the
+# sundays and returns the number of races that break it. the batch only reorders the tracks over fixed race weekends, so
+# constraints that depend on the weekends alone (four in a row, summer shutdown) would be the same for every calendar
+CONSTRAINT_VARIANTS = {
+    'none': lambda tracks, weekends, sundays: 0,
+    'temperature': countTemperatureViolations,
+}
+
+# distance in Km added to the energy of a calendar for every race that breaks its constraint so the annealing steers
+# towards calendars with fewer violations
+CONSTRAINT_PENALTY = 100000.0
+
+# the track data for the batch workers. this is loaded once in the parent and handed to each worker when the pool starts
+BATCH_DATA = None
+
+
+# function that will read in the scenario grid file. each row is a parameter name followed by the values to sweep for it
+# and every combination of the values becomes one scenario. the start and stop temperatures are in Km like the energy
+def readScenarioGrid(file):
+    grid = {'home': [9], 'cooling_rate': [0.99], 'start_temperature': [10000.0], 'stop_temperature': [10.0],
+            'seed': [0], 'constraint': ['none']}
+    seen = set()
+    for row in readCSVFile(file):
+        if len(row) < 2:
+            continue
+        name = row[0].strip()
+        if name not in grid:
+            raise ValueError(f"Unknown scenario parameter '{name}' in {file}")
+        if name in seen:
+            raise ValueError(f"Scenario parameter '{name}' appears more than once in {file}")
+        seen.add(name)
+        grid[name] = [value.strip() for value in row[1:] if value.strip()]
+        if not grid[name]:
+            raise ValueError(f"Scenario parameter '{name}' in {file} has no values")
+
+    # convert the values to the types the simulation expects
+    grid['home'] = [int(value) for value in grid['home']]
+    grid['cooling_rate'] = [float(value) for value in grid['cooling_rate']]
+    grid['start_temperature'] = [float(value) for value in grid['start_temperature']]
+    grid['stop_temperature'] = [float(value) for value in grid['stop_temperature']]
+    grid['seed'] = [int(value) for value in grid['seed']]
+    for cooling_rate in grid['cooling_rate']:
+        if not 0 < cooling_rate < 1:
+            raise ValueError(f"Cooling rate {cooling_rate} in {file} must be between 0 and 1")
+    # the annealing never finishes for a stop temperature at or below zero and never starts if it is above the start
+    for start_temperature, stop_temperature in itertools.product(grid['start_temperature'], grid['stop_temperature']):
+        if not 0 < stop_temperature < start_temperature:
+            raise ValueError(f"Stop temperature {stop_temperature} in {file} must be above 0 and below the start "
+                             f"temperature {start_temperature}")
+    for constraint in grid['constraint']:
+        if constraint not in CONSTRAINT_VARIANTS:
+            raise ValueError(f"Unknown constraint variant '{constraint}' in {file}")
+
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+
+
+# function that will calculate the energy of a track order for a scenario. the order is a list of indexes into the tracks
+# so the home track is found by its position in the order
+def calculateScenarioEnergy(order, tracks, weekends, sundays, home, constraint):
+    ordered_tracks = [tracks[i] for i in order]
+    energy = calculateSeasonDistance(ordered_tracks, weekends, order.index(home))
+    energy += CONSTRAINT_PENALTY * CONSTRAINT_VARIANTS[constraint](ordered_tracks, weekends, sundays)
+    return energy
+
+
+# function that is called once in each worker of the pool to keep hold of the track data for every scenario it runs
+def initBatchWorker(tracks, weekends, sundays):
+    global BATCH_DATA
+    BATCH_DATA = (tracks, weekends, sundays)
+
+
+# function that will run a single scenario with simulated annealing and return its result as a dictionary
+def runScenario(scenario):
+    tracks, weekends, sundays = BATCH_DATA
+    start = perf_counter()
+
+    random.seed(scenario['seed'])
+    final_state, final_energy = simulated_annealing(
+        list(range(len(tracks))),
+        energy_function=calculateScenarioEnergy,
+        cooling_rate=scenario['cooling_rate'],
+        initial_temperature=scenario['start_temperature'],
+        final_temperature=scenario['stop_temperature'],
+        tracks=tracks,
+        weekends=weekends,
+        sundays=sundays,
+        home=scenario['home'],
+        constraint=scenario['constraint']
+    )
+
+    ordered_tracks = [tracks[i] for i in final_state]
+    distance = calculateSeasonDistance(ordered_tracks, weekends, final_state.index(scenario['home']))
+    violations = CONSTRAINT_VARIANTS[scenario['constraint']](ordered_tracks, weekends, sundays)
+    result = dict(scenario)
+    result['itinerary'] = [track[0] for track in ordered_tracks]
+    result['distance'] = distance
+    result['violations'] = violations
+    result['feasible'] = violations == 0
+    result['time_ms'] = (perf_counter() - start) * 1000
+    return result
+
+
+# function that will run every scenario in the grid file on a pool of processes and write one JSON line per scenario to
+# the output file. the track data is only read in once and the results are written through a single buffered file. the
+# itinerary in each line is the track raced on each weekend of race-weekends.csv in order
+def runBatch(grid_file, output_file, processes=None):
+    scenarios = readScenarioGrid(grid_file)
+    data = (readTrackLocations(), readRaceWeekends(), readSundays())
+
+    # check the home tracks here so a bad value doesn't stop the pool part way through the output file
+    for scenario in scenarios:
+        if not 0 <= scenario['home'] < len(data[0]):
+            raise ValueError(f"Home track {scenario['home']} in {grid_file} is not between 0 and {len(data[0]) - 1}")
+
+    processes = processes or os.cpu_count() or 1
+    chunk_size = max(1, len(scenarios) // (4 * processes))
+
+    with Pool(processes, initializer=initBatchWorker, initargs=data) as pool, open(output_file, 'w') as output:
+        for result in pool.imap(runScenario, scenarios, chunksize=chunk_size):
+            output.write(json.dumps(result) + '\n')
+
+    return len(scenarios)
+
 # Additional Cases...
 
 # You will need to implement the simulated_annealing function separately.
@@ -539,8 +760,13 @@ if __name__ == '__main__':
     # you can then comment this out and move onto your SA and GA solutions
     #unittest.main()
 
-    # run the cases for simulated annealing
-    SACases()
+    # run the scenario grid given on the command line as a batch, otherwise run the cases for simulated annealing
+    if len(sys.argv) > 1:
+        output_file = sys.argv[2] if len(sys.argv) > 2 else 'scenario-results.jsonl'
+        count = runBatch(sys.argv[1], output_file)
+        print(f"Wrote {count} scenarios to {output_file}")
+    else:
+        SACases()
 
     # run the cases for genetic algorithms
     #GAcases()